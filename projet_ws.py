@@ -1,16 +1,47 @@
-from bs4 import BeautifulSoup
-import requests
+import aiohttp
+import asyncio
+import csv
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import html
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import lxml.etree
+import lxml.html
 import pandas as pd
-import time
 import random
+import threading
 from typing import List, Dict, Any
+from urllib.parse import urlsplit
 import re # NOUVEL IMPORT : Expressions régulières
 import os 
 
 # --- Configuration ---
 BASE_URL = "https://www.etreproprio.com"
 SEARCH_URL = BASE_URL + "/annonces/thflcpo.odd.g{page_index}#list"
+_IMMO_REL = "/immobilier-" # Préfixe relatif des liens d'annonces
+_IMMO_ABS = BASE_URL + _IMMO_REL # Même préfixe en URL absolue, calculé une seule fois
 MAX_PAGES = 30 
+CONCURRENCY = 8 # Nombre maximal de requêtes simultanées
+PARSE_WORKERS = os.cpu_count() # Processus dédiés au parsing des pages de détail
+POLITENESS_DELAY = (1, 3) # Délai aléatoire (s) entre deux requêtes d'un même worker vers un hôte
+POOL_MAXSIZE = 16 # Nombre maximal de connexions keep-alive conservées
+MAX_RETRIES = 4
+BACKOFF_FACTOR = 1 # Attente de BACKOFF_FACTOR * 2**tentative secondes (+ aléa) entre deux essais
+MAX_BACKOFF = 60 # Plafond du backoff exponentiel, en secondes (un Retry-After du serveur est respecté tel quel)
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+PAGE_ENCODING = "utf-8" # Encodage du site : évite la détection automatique à chaque page
+DETAIL_CLASSES = ('ep-price', 'ep-title', 'ep-area', 'ep-room')
+CSV_FILE = "annonces_scrapees.csv" # Écrit au fil de l'eau pendant le scraping
+CSV_ENCODING = "utf-8-sig" # Le BOM permet à Excel (Windows) de lire les accents et le symbole €
+# Fin d'enregistrement du CSV ; les retours à la ligne d'un titre sont normalisés en "\n" seul
+CSV_LINE_END = "\r\n"
+OUTPUT_FILE = "annonces_scrapees.parquet" # Export final en colonnes compressées (zstd)
+SEEN_FILE = "seen.txt" # URLs déjà scrapées, une par ligne (reprise après interruption)
+PROGRESS_FILE = "progress.txt" # Index de la prochaine page de résultats à traiter
+FIELDNAMES = ["price", "title", "area_bati", "area_terrain", "room"]
+# Types des colonnes du CSV : pandas construit directement des colonnes typées, sans inférence
+CSV_DTYPES = {"price": "float64", "title": "object", "area_bati": "float64", "area_terrain": "float64", "room": "int64"}
 HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
 }
@@ -19,57 +50,181 @@ HEADERS = {
 # Fonctions Utilitaires
 # ----------------------------------------------------------------------
 
-def fetch_page(url: str) -> requests.Response | None:
-    """Tente de récupérer le contenu d'une URL, gère les erreurs HTTP."""
+def create_session() -> aiohttp.ClientSession:
+    """Crée une session HTTP unique réutilisant ses connexions (keep-alive) pour tout le scraping."""
+    connector = aiohttp.TCPConnector(
+        limit=POOL_MAXSIZE,
+        limit_per_host=CONCURRENCY,
+        keepalive_timeout=30,
+        ttl_dns_cache=300,
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        headers=HEADERS,
+        timeout=aiohttp.ClientTimeout(total=10),
+    )
+
+def parse_retry_after(retry_after: str) -> float | None:
+    """Convertit un en-tête Retry-After (secondes ou date HTTP) en secondes d'attente ; None s'il est illisible."""
+    try:
+        return max(0.0, float(int(retry_after)))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+def backoff_delay(attempt: int) -> float:
+    """Backoff exponentiel plafonné à MAX_BACKOFF, avec aléa."""
+    return min(MAX_BACKOFF, BACKOFF_FACTOR * 2 ** attempt) + random.random()
+
+# Prochain instant (horloge de la boucle asyncio) où une requête peut partir vers chaque hôte
+_next_request_at: Dict[str, float] = {}
+# Instant jusqu'auquel chaque hôte a demandé une pause (Retry-After)
+_host_paused_until: Dict[str, float] = {}
+
+def pause_host(url: str, delay: float) -> None:
+    """Repousse de `delay` secondes toutes les requêtes vers l'hôte de `url`, comme demandé par son Retry-After."""
+    host = urlsplit(url).netloc
+    resume_at = asyncio.get_running_loop().time() + delay
+    _host_paused_until[host] = max(_host_paused_until.get(host, resume_at), resume_at)
+    _next_request_at[host] = max(_next_request_at.get(host, resume_at), resume_at)
+
+async def wait_for_host(url: str) -> None:
+    """Attend le créneau de l'hôte de `url` : CONCURRENCY workers gardent chacun POLITENESS_DELAY entre deux requêtes."""
+    host = urlsplit(url).netloc
+    loop = asyncio.get_running_loop()
+    while True:
+        now = loop.time()
+        start = max(now, _next_request_at.get(host, now))
+        # Le délai d'un worker est réparti entre les CONCURRENCY requêtes en parallèle
+        _next_request_at[host] = start + random.uniform(*POLITENESS_DELAY) / CONCURRENCY
+        await asyncio.sleep(start - now)
+        # Une pause demandée pendant l'attente annule le créneau déjà réservé : on en reprend un après elle
+        if _host_paused_until.get(host, 0.0) <= loop.time():
+            return
+
+async def fetch_page(session: aiohttp.ClientSession, url: str, sem: asyncio.Semaphore) -> bytes | None:
+    """Tente de récupérer le contenu d'une URL, gère les erreurs HTTP et réessaie sur les erreurs transitoires."""
+    for attempt in range(MAX_RETRIES + 1):
+        last_try = attempt == MAX_RETRIES
+        try:
+            async with sem:
+                # Le créneau de l'hôte est réservé une fois le slot obtenu : l'espacement vaut
+                # au moment où la requête part, même quand des requêtes attendaient le sémaphore
+                await wait_for_host(url)
+                async with session.get(url) as response:
+                    if response.status not in RETRY_STATUSES or last_try:
+                        response.raise_for_status()
+                        return await response.read()
+                    # Erreur transitoire (429/5xx) : quand le serveur indique Retry-After, la pause
+                    # s'applique à toutes les requêtes vers l'hôte, pas seulement à celle-ci
+                    reason = f"Statut {response.status}"
+                    retry_after = response.headers.get("Retry-After")
+                    requested_delay = parse_retry_after(retry_after) if retry_after else None
+                    if requested_delay is not None:
+                        pause_host(url, requested_delay)
+                        delay = requested_delay
+                    else:
+                        delay = backoff_delay(attempt)
+        except aiohttp.ClientResponseError as e:
+            # Erreur HTTP définitive (404, 403...) : inutile de réessayer
+            print(f"❌ Erreur lors de la récupération de {url}: {e}")
+            return None
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            # Erreur réseau (coupure, timeout) : également considérée comme transitoire
+            if last_try:
+                print(f"❌ Erreur lors de la récupération de {url}: {e}")
+                return None
+            delay = backoff_delay(attempt)
+            reason = f"Erreur réseau ({e!r})"
+            
+        # Attente hors du sémaphore avant de réessayer
+        print(f"⏳ {reason} pour {url}, nouvelle tentative dans {delay:.1f}s")
+        await asyncio.sleep(delay)
+        
+    return None
+
+def has_class_xpath(class_name: str) -> str:
+    """Prédicat XPath équivalent au sélecteur CSS `.class_name` (classe parmi d'autres dans l'attribut)."""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')"
+
+
+# Requêtes compilées une seule fois au chargement du module, puis réutilisées pour chaque page
+# Requête groupée : un seul parcours de l'arbre pour les quatre champs
+DETAIL_XPATH = lxml.etree.XPath("//div[" + " or ".join(has_class_xpath(class_name) for class_name in DETAIL_CLASSES) + "]")
+WRAPPER_XPATH = lxml.etree.XPath(f"//div[{has_class_xpath('ep-search-list-wrapper')}]")
+LINKS_XPATH = lxml.etree.XPath(".//a[@href]")
+TERRAIN_XPATH = lxml.etree.XPath(f".//span[{has_class_xpath('dtl-main-surface-terrain')}]")
+
+
+# Un parser lxml ne doit pas être partagé entre threads : un par thread (et donc par processus du pool)
+_parser_local = threading.local()
+
+def get_html_parser() -> lxml.html.HTMLParser:
+    """Renvoie le parser HTML du thread courant, créé au premier appel puis réutilisé pour chaque page."""
+    parser = getattr(_parser_local, "parser", None)
+    if parser is None:
+        parser = lxml.html.HTMLParser(encoding=PAGE_ENCODING, recover=True)
+        _parser_local.parser = parser
+    return parser
+
+def parse_html(content: bytes) -> lxml.html.HtmlElement | None:
+    """Construit directement l'arbre lxml d'une page, en imposant l'encodage du site (None si la page est vide)."""
     try:
-        response = requests.get(url, headers=HEADERS, timeout=10)
-        response.raise_for_status()
-        time.sleep(random.uniform(1, 3))
-        return response
-    except requests.exceptions.RequestException as e:
-        print(f"❌ Erreur lors de la récupération de {url}: {e}")
+        return lxml.html.fromstring(content, parser=get_html_parser())
+    except lxml.etree.ParserError as e:
+        # Corps composé uniquement d'espaces ou de commentaires : "Document is empty"
+        print(f"⚠️ Avertissement: page illisible ({e}).")
         return None
 
-def extract_listing_links(soup: BeautifulSoup) -> List[str]:
+def extract_listing_links(tree: lxml.html.HtmlElement) -> List[str]:
     """Extrait les liens d'annonces de la page de résultats."""
-    links = []
+    # Un set dédoublonne les liens dès l'insertion
+    links: set[str] = set()
     try:
-        wrapper = soup.find("div", class_='ep-search-list-wrapper')
-        if not wrapper:
+        wrappers = WRAPPER_XPATH(tree)
+        if not wrappers:
             print("⚠️ Avertissement: Wrapper de liste non trouvé sur la page.")
-            return links
+            return []
             
-        all_a_tags = wrapper.find_all("a", href=True)
+        all_a_tags = LINKS_XPATH(wrappers[0])
         
         for tag in all_a_tags:
-            href = tag['href']
-            if href.startswith("/immobilier-"):
-                full_url = BASE_URL + href
-                links.append(full_url)
-            elif href.startswith(BASE_URL + "/immobilier-"):
-                 links.append(href)
+            href = tag.get('href')
+            if href.startswith(_IMMO_REL):
+                links.add(BASE_URL + href)
+            elif href.startswith(_IMMO_ABS):
+                links.add(href)
                  
     except Exception as e:
         print(f"❌ Erreur lors de l'extraction des liens : {e}")
         
-    return list(set(links))
+    return list(links)
 
 # ----------------------------------------------------------------------
 # Fonctions d'Extraction (Mise à jour pour un nettoyage plus robuste)
 # ----------------------------------------------------------------------
 
+# Compilés une seule fois : clean_to_float est appelée plusieurs fois par annonce
+_TRANS = str.maketrans({u'\xa0': '', ' ': '', ',': '.'})
+_NUM_RE = re.compile(r'[^\d.]')
+
+
 def clean_to_float(text: str) -> float:
     """Nettoie la chaîne de caractères pour obtenir un nombre décimal fiable."""
     if not isinstance(text, str):
         return 0.0
         
-    # Étape 1: Retire les espaces insécables (&nbsp;), les unités (m²), et les devises (€)
-    text = text.replace(u'\xa0', '').replace(' ', '').replace('m²', '').replace('€', '').strip()
+    # Étape 1: En une passe, retire les espaces (y compris insécables) et remplace la virgule par un point pour float()
+    text = text.translate(_TRANS)
     
-    # Étape 2: Utilise une expression régulière pour ne garder que les chiffres et les séparateurs décimaux
-    # On autorise le point et la virgule, puis on remplace la virgule par un point pour float()
-    cleaned_text = re.sub(r'[^\d,.]', '', text)
-    cleaned_text = cleaned_text.replace(",", ".")
+    # Étape 2: Ne garde que les chiffres et le point décimal (les unités m² et € disparaissent ici)
+    cleaned_text = _NUM_RE.sub('', text)
     
     # Étape 3: Tente la conversion
     try:
@@ -78,30 +233,41 @@ def clean_to_float(text: str) -> float:
         return 0.0
 
 
-def extract_area_details(soup_obj: BeautifulSoup) -> Dict[str, float]:
+def find_detail_elements(tree: lxml.html.HtmlElement) -> Dict[str, lxml.html.HtmlElement]:
+    """Récupère en un seul parcours la première div de chaque classe de DETAIL_CLASSES."""
+    elements: Dict[str, lxml.html.HtmlElement] = {}
+    for element in DETAIL_XPATH(tree):
+        for class_name in element.get("class", "").split():
+            if class_name in DETAIL_CLASSES and class_name not in elements:
+                elements[class_name] = element
+    return elements
+
+
+def extract_area_details(area_div: lxml.html.HtmlElement | None) -> Dict[str, float]:
     """Extrait la surface du bâti et la surface du terrain séparément."""
     
     area_data = {"area_bati": 0.0, "area_terrain": 0.0}
     
     try:
-        area_div = soup_obj.find("div", class_='ep-area')
-        if not area_div:
+        # Un élément lxml sans enfant est "faux" : on teste explicitement None
+        if area_div is None:
             return area_data
         
         # 1. Extraction de la Surface du Terrain (dans le SPAN)
-        terrain_span = area_div.find("span", class_='dtl-main-surface-terrain')
-        if terrain_span:
-            terrain_text = terrain_span.text
+        terrain_spans = TERRAIN_XPATH(area_div)
+        terrain_span = terrain_spans[0] if terrain_spans else None
+        if terrain_span is not None:
+            terrain_text = terrain_span.text_content()
             # Nettoyage robuste pour la valeur du terrain
             area_data['area_terrain'] = clean_to_float(terrain_text)
                 
         # 2. Extraction de la Surface du Bâti (le nœud de texte principal)
-        # Supprimer le SPAN de la soupe temporaire pour isoler le texte du bâti
-        if terrain_span:
-             terrain_span.decompose() 
+        # Supprimer le SPAN de l'arbre (drop_tree conserve le texte qui le suit) pour isoler le texte du bâti
+        if terrain_span is not None:
+             terrain_span.drop_tree()
         
         # Le texte restant dans la div est la surface du bâti/maison
-        bati_text = area_div.text.strip()
+        bati_text = area_div.text_content().strip()
         # Nettoyage robuste pour la valeur du bâti
         area_data['area_bati'] = clean_to_float(bati_text)
             
@@ -112,39 +278,39 @@ def extract_area_details(soup_obj: BeautifulSoup) -> Dict[str, float]:
     return area_data
 
 
-def get_text_or_default(soup_obj: BeautifulSoup, class_name: str, default_value: Any = None) -> Any:
+def clean_field(text: str, class_name: str, default_value: Any = None) -> Any:
+    """Nettoie le texte brut d'un champ de l'annonce (prix, pièces ou titre)."""
+    text = text.strip()
+    
+    if class_name == 'ep-price':
+        # Utilise clean_to_float pour le prix aussi, car il peut contenir des séparateurs
+        return clean_to_float(text)
+    elif class_name == 'ep-room':
+        # Pour les pièces, on ne veut que l'entier (pas besoin d'expressions régulières si clean_to_float est overkill)
+        cleaned_text = ''.join(filter(str.isdigit, text)).strip()
+        return cleaned_text if cleaned_text else default_value
+    else:
+        return text # Pour le titre
+
+
+def get_text_or_default(element: lxml.html.HtmlElement | None, class_name: str, default_value: Any = None) -> Any:
     """Fonction utilitaire pour extraire le texte d'une balise div et le nettoyer (pour prix et pièces)."""
     try:
-        element = soup_obj.find("div", class_=class_name)
-        if element:
-            text = element.text.strip()
-            
-            if class_name == 'ep-price':
-                # Utilise clean_to_float pour le prix aussi, car il peut contenir des séparateurs
-                return clean_to_float(text)
-            elif class_name == 'ep-room':
-                # Pour les pièces, on ne veut que l'entier (pas besoin d'expressions régulières si clean_to_float est overkill)
-                cleaned_text = ''.join(filter(str.isdigit, text)).strip()
-                return cleaned_text if cleaned_text else default_value
-            else:
-                return text # Pour le titre
+        if element is not None:
+            return clean_field(element.text_content(), class_name, default_value)
         return default_value
     except Exception:
         return default_value
 
 
-def extract_detail(soup: BeautifulSoup) -> Dict[str, Any]:
-    """Extrait l'ensemble des détails d'une page d'annonce."""
-    
-    # Appel de la fonction spécifique pour les surfaces
-    area_results = extract_area_details(soup)
-
+def build_detail(price: Any, title: Any, area_results: Dict[str, float], room: Any) -> Dict[str, Any]:
+    """Assemble les champs extraits en une ligne de résultat."""
     data = {
-        "price": get_text_or_default(soup, 'ep-price', 0), # Prix est maintenant float après clean_to_float
-        "title": get_text_or_default(soup, 'ep-title', ""),
+        "price": price, # Prix est maintenant float après clean_to_float
+        "title": title,
         "area_bati": area_results["area_bati"],
         "area_terrain": area_results["area_terrain"],
-        "room": get_text_or_default(soup, 'ep-room', 0),
+        "room": room,
     }
 
     # Tentative de conversion finale pour price et room (room uniquement)
@@ -155,50 +321,281 @@ def extract_detail(soup: BeautifulSoup) -> Dict[str, Any]:
         
     return data
 
+
+def extract_detail(tree: lxml.html.HtmlElement) -> Dict[str, Any]:
+    """Extrait l'ensemble des détails d'une page d'annonce."""
+    
+    elements = find_detail_elements(tree)
+    
+    # Appel de la fonction spécifique pour les surfaces
+    area_results = extract_area_details(elements.get('ep-area'))
+
+    return build_detail(
+        get_text_or_default(elements.get('ep-price'), 'ep-price', 0),
+        get_text_or_default(elements.get('ep-title'), 'ep-title', ""),
+        area_results,
+        get_text_or_default(elements.get('ep-room'), 'ep-room', 0),
+    )
+
+
+def class_tag_pattern(tag: str, class_name: str) -> bytes:
+    """Motif (octets) d'une balise ouvrante `tag` dont l'attribut class contient `class_name`."""
+    return (
+        b'<' + tag.encode() + rb'(?:\s[^>]*?)?\sclass="(?:[^"]*\s)?'
+        + re.escape(class_name.encode()) + rb'(?:\s[^"]*)?"[^>]*>'
+    )
+
+
+# Chemin rapide : les pages sont générées côté serveur avec un gabarit stable, les champs
+# se lisent donc directement dans les octets bruts sans construire d'arbre DOM.
+# Il ne couvre que le balisage qu'il sait vérifier ; tout le reste passe par lxml.
+_RE_FIELD_OPEN = {class_name: re.compile(class_tag_pattern("div", class_name)) for class_name in DETAIL_CLASSES}
+# Contenu texte seul (aucune balise imbriquée) jusqu'à la fermeture de la div
+_RE_PLAIN_CONTENT = re.compile(rb'([^<]*)</div>')
+# Surface du bâti, éventuellement suivie du SPAN de surface du terrain
+_RE_AREA_CONTENT = re.compile(
+    rb'([^<]*)(?:' + class_tag_pattern("span", "dtl-main-surface-terrain") + rb'([^<]*)</span>([^<]*))?</div>'
+)
+# Zones dont le contenu n'est pas du balisage pour le DOM : commentaires, <script> et <style>
+_RE_RAW_SECTION = re.compile(rb'<!--.*?(?:-->|\Z)|<(script|style)\b.*?(?:</\1\s*>|\Z)', re.S | re.I)
+
+
+def decode_text(raw: bytes) -> str:
+    """Décode un fragment de page brut en texte (entités HTML comprises, fins de ligne normalisées comme le parser)."""
+    text = raw.decode(PAGE_ENCODING, errors="replace").replace("\r\n", "\n").replace("\r", "\n")
+    return html.unescape(text)
+
+
+def match_field_content(
+    content: bytes, class_name: str, content_re: re.Pattern[bytes], raw_sections: List[tuple[int, int]]
+) -> re.Match[bytes] | None:
+    """Applique `content_re` juste après l'unique div de classe `class_name`.
+
+    Renvoie None si le motif apparaît plusieurs fois (copie dans un <textarea>, un <title>, la
+    valeur d'un attribut...) ou tombe dans un commentaire ou un bloc <script>/<style> : l'élément
+    vu par le DOM peut alors être un autre, seul lxml peut trancher.
+    """
+    openings = _RE_FIELD_OPEN[class_name].finditer(content)
+    opening = next(openings, None)
+    if opening is None or next(openings, None) is not None:
+        return None
+    position = opening.start()
+    if any(start <= position < end for start, end in raw_sections):
+        return None
+    return content_re.match(content, opening.end())
+
+
+def extract_detail_fast(content: bytes) -> Dict[str, Any] | None:
+    """Extrait les détails par expressions régulières ; renvoie None si la page sort du gabarit attendu."""
+    raw_sections = [match.span() for match in _RE_RAW_SECTION.finditer(content)]
+    texts: Dict[str, str] = {}
+    for class_name in ('ep-price', 'ep-title', 'ep-room'):
+        match = match_field_content(content, class_name, _RE_PLAIN_CONTENT, raw_sections)
+        if match is None:
+            return None
+        texts[class_name] = decode_text(match.group(1))
+    
+    area_match = match_field_content(content, 'ep-area', _RE_AREA_CONTENT, raw_sections)
+    if area_match is None:
+        return None
+    bati_raw, terrain_raw, tail_raw = area_match.groups()
+    area_results = {
+        # Comme dans extract_area_details, le texte qui suit le SPAN fait partie du bâti
+        "area_bati": clean_to_float(decode_text(bati_raw + (tail_raw or b"")).strip()),
+        "area_terrain": clean_to_float(decode_text(terrain_raw)) if terrain_raw is not None else 0.0,
+    }
+    
+    return build_detail(
+        clean_field(texts['ep-price'], 'ep-price', 0),
+        clean_field(texts['ep-title'], 'ep-title', ""),
+        area_results,
+        clean_field(texts['ep-room'], 'ep-room', 0),
+    )
+
+
+def parse_detail(content: bytes) -> Dict[str, Any] | None:
+    """Parse une page de détail brute et en extrait les données (exécutée dans un processus du pool).
+
+    Renvoie None si la page ne contient aucun document exploitable.
+    """
+    data = extract_detail_fast(content)
+    if data is None:
+        # Gabarit inattendu : on retombe sur le parsing lxml complet
+        tree = parse_html(content)
+        if tree is None:
+            return None
+        data = extract_detail(tree)
+    return data
+
+# ----------------------------------------------------------------------
+# Reprise (checkpoint)
+# ----------------------------------------------------------------------
+
+def load_seen_urls(path: str) -> set[str]:
+    """Charge les URLs déjà scrapées lors des exécutions précédentes."""
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8") as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+def load_start_page(path: str) -> int:
+    """Renvoie l'index de la page de résultats à laquelle reprendre (0 par défaut)."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return 0
+
+
+def save_progress(path: str, next_page_index: int) -> None:
+    """Enregistre l'index de la prochaine page de résultats à traiter."""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(str(next_page_index))
+
+def drop_partial_last_line(path: str) -> None:
+    """Tronque un dernier enregistrement incomplet (arrêt brutal en cours d'écriture) pour que l'ajout suivant ne s'y colle pas."""
+    if not os.path.exists(path):
+        return
+    line_end = CSV_LINE_END.encode()
+    with open(path, "rb+") as f:
+        # Cas normal : le fichier se termine par une fin d'enregistrement, seuls les derniers octets sont lus
+        size = f.seek(0, os.SEEK_END)
+        if size == 0:
+            return
+        f.seek(max(0, size - len(line_end)))
+        if f.read() == line_end:
+            return
+            
+        # Après un arrêt brutal : parcours ligne à ligne pour repérer la fin du dernier enregistrement complet.
+        # Un titre peut contenir des retours à la ligne entre guillemets : chaque guillemet (les guillemets
+        # internes sont doublés) bascule l'état, et une ligne ne clôt un enregistrement qu'hors guillemets
+        f.seek(0)
+        complete_end = 0
+        in_quotes = False
+        for line in iter(f.readline, b""):
+            if line.count(b'"') % 2:
+                in_quotes = not in_quotes
+            if not in_quotes and line.endswith(b"\n"):
+                complete_end = f.tell()
+        f.truncate(complete_end)
+
+def load_scraped_data(path: str) -> pd.DataFrame:
+    """Charge le CSV des annonces en colonnes typées (aucune inférence de type, titres vides conservés)."""
+    # Une ligne tronquée par un arrêt brutal est retirée par drop_partial_last_line avant tout ajout ;
+    # on_bad_lines ignore en plus toute ligne mal formée (nombre de champs incorrect)
+    return pd.read_csv(
+        path, usecols=FIELDNAMES, dtype=CSV_DTYPES, na_filter=False, on_bad_lines="skip", encoding=CSV_ENCODING
+    )
+
+def export_parquet(df: pd.DataFrame, path: str) -> bool:
+    """Exporte les annonces en Parquet (zstd) ; renvoie False si pyarrow n'est pas installé."""
+    try:
+        # pyarrow ne publie pas de wheel PyPy : sans lui, seul le CSV est produit
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        return False
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pq.write_table(table, path, compression='zstd')
+    return True
+
 # ----------------------------------------------------------------------
 # Fonction Principale
 # ----------------------------------------------------------------------
 
-def main():
+async def main() -> None:
     """Fonction principale pour orchestrer le scraping."""
     
-    all_data: List[Dict[str, Any]] = []
+    row_count = 0
+    sem = asyncio.Semaphore(CONCURRENCY)
+    loop = asyncio.get_running_loop()
+    seen = load_seen_urls(SEEN_FILE)
+    start_page = load_start_page(PROGRESS_FILE)
     
-    for page_index in range(MAX_PAGES):
-        list_url = SEARCH_URL.format(page_index=page_index)
-        print(f"🔎 Traitement de la page {page_index + 1}/{MAX_PAGES}: {list_url}")
-        
-        page_response = fetch_page(list_url)
-        if not page_response:
-            continue
-            
-        list_soup = BeautifulSoup(page_response.content, 'html.parser')
-        listing_links = extract_listing_links(list_soup)
-        
-        print(f"    - {len(listing_links)} annonces trouvées.")
+    if seen or start_page:
+        print(f"♻️ Reprise : {len(seen)} annonces déjà scrapées, départ à la page {start_page + 1}.")
+    
+    drop_partial_last_line(CSV_FILE)
+    write_header = not os.path.exists(CSV_FILE) or os.path.getsize(CSV_FILE) == 0
+    
+    # Chaque annonce est écrite dès son extraction : rien n'est perdu en cas d'interruption.
+    # Les workers de parsing sont lancés en "spawn" : un fork copierait un processus déjà multi-thread (asyncio.to_thread)
+    # En mode ajout, le BOM n'est écrit que si le fichier est vide
+    with open(CSV_FILE, "a", newline="", encoding=CSV_ENCODING) as csv_file, \
+         open(SEEN_FILE, "a", buffering=1, encoding="utf-8") as seen_file, \
+         ProcessPoolExecutor(max_workers=PARSE_WORKERS, mp_context=multiprocessing.get_context("spawn")) as parse_pool:
+        writer = csv.DictWriter(csv_file, fieldnames=FIELDNAMES, lineterminator=CSV_LINE_END)
+        if write_header:
+            writer.writeheader()
         
-        for link in listing_links:
-            detail_response = fetch_page(link)
-            if not detail_response:
-                continue
+        async with create_session() as session:
+            for page_index in range(start_page, MAX_PAGES):
+                list_url = SEARCH_URL.format(page_index=page_index)
+                print(f"🔎 Traitement de la page {page_index + 1}/{MAX_PAGES}: {list_url}")
                 
-            detail_soup = BeautifulSoup(detail_response.content, 'html.parser')
-            announcement_data = extract_detail(detail_soup)
-            
-            # Affichage console mis à jour
-            print(f"      -> Prix: {announcement_data['price']:,.0f}€, Bâti: {announcement_data['area_bati']:.1f}m², Terrain: {announcement_data['area_terrain']:.1f}m², Pièces: {announcement_data['room']}")
-            
-            all_data.append(announcement_data)
+                page_content = await fetch_page(session, list_url, sem)
+                if not page_content:
+                    continue
+                    
+                # Le parsing lxml tourne dans un thread pour ne pas bloquer la boucle d'événements
+                list_tree = await asyncio.to_thread(parse_html, page_content)
+                listing_links = extract_listing_links(list_tree) if list_tree is not None else []
+                new_links = [link for link in listing_links if link not in seen]
+                
+                print(f"    - {len(listing_links)} annonces trouvées ({len(listing_links) - len(new_links)} déjà scrapées).")
+                
+                # Récupération concurrente des pages de détail (limitée par le sémaphore)
+                detail_pages = await asyncio.gather(*[fetch_page(session, link, sem) for link in new_links])
+                
+                fetched = [(link, content) for link, content in zip(new_links, detail_pages) if content]
+                written_links: List[str] = []
+                
+                # Le parsing (CPU) est réparti sur plusieurs cœurs, hors de la boucle d'événements
+                # return_exceptions : une page en erreur ne fait perdre que sa propre ligne
+                parsed = await asyncio.gather(*[
+                    loop.run_in_executor(parse_pool, parse_detail, content) for _, content in fetched
+                ], return_exceptions=True)
+                
+                for (link, _), announcement_data in zip(fetched, parsed):
+                    if isinstance(announcement_data, BaseException):
+                        print(f"❌ Erreur lors de l'extraction de {link}: {announcement_data!r}")
+                        continue
+                    if announcement_data is None:
+                        # Page vide : aucune ligne, l'URL n'est pas marquée comme vue et sera retentée
+                        continue
+                        
+                    # Affichage console mis à jour
+                    print(f"      -> Prix: {announcement_data['price']:,.0f}€, Bâti: {announcement_data['area_bati']:.1f}m², Terrain: {announcement_data['area_terrain']:.1f}m², Pièces: {announcement_data['room']}")
+                    
+                    writer.writerow(announcement_data)
+                    written_links.append(link)
+                    row_count += 1
+                    
+                # Les lignes sont mises sur disque avant que leurs URLs ne soient marquées comme vues :
+                # après un arrêt brutal, une URL présente dans SEEN_FILE a toujours sa ligne dans le CSV
+                csv_file.flush()
+                os.fsync(csv_file.fileno())
+                for link in written_links:
+                    seen.add(link)
+                    seen_file.write(link + "\n")
+                save_progress(PROGRESS_FILE, page_index + 1)
 
-    if all_data:
-        df = pd.DataFrame(all_data)
-        output_file = "annonces_scrapees.xlsx"
-        
-        df.to_excel(output_file, index=False)
+    # Toutes les pages ont été traitées : la prochaine exécution repart de la première page
+    # (les annonces déjà vues restent ignorées grâce à SEEN_FILE)
+    if os.path.exists(PROGRESS_FILE):
+        os.remove(PROGRESS_FILE)
+
+    df = load_scraped_data(CSV_FILE) if os.path.getsize(CSV_FILE) else pd.DataFrame()
+    if not df.empty:
         print("\n✅ Scraping terminé !")
-        print(f"💾 Fichier créé : {output_file} ({len(df)} lignes)")
+        # Conversion unique en Parquet à partir du CSV complet (bien plus rapide et compact que XLSX)
+        if export_parquet(df, OUTPUT_FILE):
+            print(f"💾 Fichiers créés : {CSV_FILE}, {OUTPUT_FILE} ({len(df)} lignes, dont {row_count} nouvelles)")
+        else:
+            print(f"💾 Fichier créé : {CSV_FILE} ({len(df)} lignes, dont {row_count} nouvelles) — export Parquet ignoré (pyarrow absent)")
     else:
         print("\n😔 Aucun donnée n'a été extraite. Le site a peut-être bloqué l'accès ou la structure a changé.")
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())